@@ -205,11 +205,17 @@ class LinkedList:
 
 class HashEntry:
 
-    def __init__(self, key: str, value: object) -> None:
+    def __init__(self, key: str, value: object, hash_val: int = None) -> None:
         """Initialize an entry for use in a hash map."""
         self.key = key
         self.value = value
 
+        # hash of the key, cached so it never has to be recomputed
+        self.hash = hash_val
+
+        # distance from the home bucket, maintained by Robin Hood probing
+        self.dfb = 0
+
         # Set this value to True when you "delete" a HashEntry
         self.is_tombstone = False
 